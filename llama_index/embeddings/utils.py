@@ -1,6 +1,9 @@
 """Embedding utils for LlamaIndex."""
 import os
-from typing import List, Optional, Union
+from functools import lru_cache
+from typing import Callable, List, Literal, Optional, Union
+
+import numpy as np
 
 from llama_index.bridge.langchain import Embeddings as LCEmbeddings
 from llama_index.embeddings.base import BaseEmbedding
@@ -17,6 +20,7 @@ from llama_index.token_counter.mock_embed_model import MockEmbedding
 from llama_index.utils import get_cache_dir
 
 EmbedType = Union[BaseEmbedding, LCEmbeddings, str]
+EmbeddingDType = Literal["fp32", "fp16", "int8"]
 
 
 def save_embedding(embedding: List[float], file_path: str) -> None:
@@ -34,6 +38,70 @@ def load_embedding(file_path: str) -> List[float]:
         return embedding
 
 
+@lru_cache(maxsize=None)
+def _get_numba_int8_quantizer() -> Optional[Callable[[np.ndarray], np.ndarray]]:
+    """Get a numba-compiled int8 quantization kernel, if numba is installed.
+
+    The kernel computes each scale and the codes in one pass per row, without the
+    temporary arrays of the numpy implementation.
+
+    NOTE: the kernel is compiled eagerly and cached on disk, so the JIT cost is
+    paid here rather than on the first insert. It is not `parallel`, since numba's
+    fallback threading layer aborts when called from several threads at once, and
+    the kernel is memory-bound anyway.
+    """
+    try:
+        import numba
+    except ImportError:
+        return None
+
+    @numba.njit("int8[:, :](float32[:, :])", cache=True)
+    def quantize_int8(embeddings: np.ndarray) -> np.ndarray:
+        n, d = embeddings.shape
+        codes = np.empty((n, d), dtype=np.int8)
+        for i in range(n):
+            max_abs = np.float32(0.0)
+            for j in range(d):
+                max_abs = max(max_abs, abs(embeddings[i, j]))
+            scale = max_abs / np.float32(127) if max_abs > 0 else np.float32(1.0)
+            for j in range(d):
+                codes[i, j] = np.int8(np.rint(embeddings[i, j] / scale))
+        return codes
+
+    return quantize_int8
+
+
+def quantize_embeddings(
+    embeddings: np.ndarray, dtype: EmbeddingDType = "fp32"
+) -> np.ndarray:
+    """Quantize an (N, D) array of embeddings to a lower precision dtype.
+
+    - "fp32": embeddings are returned unchanged.
+    - "fp16": values are rounded to half precision.
+    - "int8": each embedding is scaled symmetrically by max(|v|) / 127 and rounded
+      to int8 codes. The per-embedding scale is dropped, so only scale-invariant
+      similarities (e.g. cosine similarity) are preserved.
+    """
+    embeddings = np.asarray(embeddings)
+    if dtype == "fp32" or embeddings.size == 0:
+        return embeddings
+
+    array = embeddings.astype(np.float32)
+    if dtype == "fp16":
+        return array.astype(np.float16)
+    elif dtype == "int8":
+        # NOTE: use the numba kernel if available, it gives the same result
+        numba_quantize_int8 = _get_numba_int8_quantizer()
+        if numba_quantize_int8 is not None:
+            return numba_quantize_int8(np.ascontiguousarray(array))
+
+        scale = np.abs(array).max(axis=1, keepdims=True) / 127
+        scale[scale == 0] = 1
+        return np.round(array / scale).astype(np.int8)
+    else:
+        raise ValueError(f"Invalid embedding dtype: {dtype}")
+
+
 def resolve_embed_model(embed_model: Optional[EmbedType] = None) -> BaseEmbedding:
     """Resolve embed model."""
     if embed_model == "default":
@@ -3,28 +3,240 @@
 An index that that is built on top of multiple vector stores for different modalities.
 
 """
+import asyncio
+import hashlib
 import logging
-from typing import Any, List, Optional, Sequence
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import cached_property, lru_cache, partial
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    get_args,
+)
+
+import numpy as np
 
 from llama_index.data_structs.data_structs import IndexDict, MultiModelIndexDict
 from llama_index.embeddings.mutli_modal_base import MultiModalEmbedding
-from llama_index.embeddings.utils import EmbedType, resolve_embed_model
+from llama_index.embeddings.utils import (
+    EmbeddingDType,
+    EmbedType,
+    quantize_embeddings,
+    resolve_embed_model,
+)
 from llama_index.indices.base_retriever import BaseRetriever
 from llama_index.indices.service_context import ServiceContext
 from llama_index.indices.utils import (
-    async_embed_image_nodes,
-    async_embed_nodes,
-    embed_image_nodes,
-    embed_nodes,
+    async_embed_image_nodes_array,
+    async_embed_nodes_array,
+    embed_image_nodes_array,
+    embed_nodes_array,
 )
 from llama_index.indices.vector_store.base import VectorStoreIndex
-from llama_index.schema import BaseNode, ImageNode
+from llama_index.schema import BaseNode, ImageNode, MetadataMode
 from llama_index.storage.storage_context import StorageContext
-from llama_index.vector_stores.simple import DEFAULT_VECTOR_STORE, SimpleVectorStore
+from llama_index.vector_stores.simple import SimpleVectorStore
 from llama_index.vector_stores.types import VectorStore
 
 logger = logging.getLogger(__name__)
 
+# max number of chunks waiting between the stages of the async add pipeline
+PIPELINE_QUEUE_SIZE = 4
+
+
+@lru_cache(maxsize=8)
+def _resolve_image_embed_model_from_str(image_embed_model: str) -> MultiModalEmbedding:
+    """Resolve an image embed model from a string.
+
+    Cached, so that indices created with the same model name in a process share a
+    single model instance instead of loading the model weights again.
+
+    """
+    embed_model = resolve_embed_model(image_embed_model)
+    assert isinstance(embed_model, MultiModalEmbedding)
+    return embed_model
+
+
+def _get_image_content_key(node: ImageNode) -> Optional[str]:
+    """Get a hash of the image content of a node, used to cache its embedding.
+
+    Inline images and readable image files are keyed by their content, so a file
+    that changes gets a new key. Image urls, and files that can't be read, are
+    keyed by reference only, since fetching them just to hash them would cost as
+    much as resolving them.
+
+    """
+    if node.image_path is not None and node.image is None:
+        try:
+            with open(node.image_path, "rb") as f:
+                return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+        except OSError:
+            pass
+    return _get_image_ref_key(node)
+
+
+def _get_image_ref_key(node: ImageNode) -> Optional[str]:
+    """Get a hash of the image reference of a node, without reading the image."""
+    image_ref = node.image or node.image_path or node.image_url
+    if image_ref is None:
+        return None
+    return hashlib.blake2b(image_ref.encode(), digest_size=16).hexdigest()
+
+
+def _get_text_key(node: BaseNode) -> str:
+    """Get a hash of the content of a node that is embedded."""
+    content = node.get_content(metadata_mode=MetadataMode.EMBED)
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+def _dedupe_nodes(
+    nodes: Sequence[BaseNode], keys: Sequence[Optional[str]]
+) -> Tuple[Sequence[BaseNode], Sequence[Optional[str]], Optional[List[int]]]:
+    """Deduplicate nodes with the same key, so each is only embedded once.
+
+    Returns the unique nodes and their keys, and for each input node the position
+    of its unique representative, or None if there are no duplicates. Nodes
+    without a key are never deduplicated.
+
+    """
+    unique_nodes: List[BaseNode] = []
+    unique_keys: List[Optional[str]] = []
+    inverse: List[int] = []
+    positions_by_key: Dict[str, int] = {}
+    for node, key in zip(nodes, keys):
+        if key is None or key not in positions_by_key:
+            if key is not None:
+                positions_by_key[key] = len(unique_nodes)
+            inverse.append(len(unique_nodes))
+            unique_nodes.append(node)
+            unique_keys.append(key)
+        else:
+            inverse.append(positions_by_key[key])
+
+    if len(unique_nodes) == len(nodes):
+        return nodes, keys, None
+    return unique_nodes, unique_keys, inverse
+
+
+def _attach_embedding(node: BaseNode, embedding: Optional[List[float]]) -> BaseNode:
+    """Get a copy of a node with the given embedding attached.
+
+    Uses pydantic's `construct` to skip validation, since the node is already valid
+    and only its embedding changes. Falls back to `copy` if `construct` is not
+    available.
+
+    """
+    node_cls = type(node)
+    if not hasattr(node_cls, "construct"):
+        result = node.copy()
+        result.embedding = embedding
+        return result
+
+    node_dict = node.__dict__.copy()
+    node_dict["embedding"] = embedding
+    return node_cls.construct(
+        _fields_set=node.__fields_set__ | {"embedding"}, **node_dict
+    )
+
+
+def _get_node_without_embedding(node: BaseNode) -> BaseNode:
+    """Get a node without an embedding attached.
+
+    The node is only copied if it has an embedding, since nodes without one can be
+    stored as is.
+
+    """
+    if node.embedding is None:
+        return node
+    return _attach_embedding(node, None)
+
+
+class _AsyncInsertBatcher:
+    """Coalesce concurrent async inserts into shared embed + vector store calls.
+
+    Nodes submitted within `wait_time_ms` of the first pending submission, up to
+    `max_rows` nodes, are passed to `flush_fn` together. Each submitter gets back the
+    ids assigned to its own nodes.
+
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[BaseNode]], Awaitable[List[str]]],
+        wait_time_ms: int,
+        max_rows: int,
+    ) -> None:
+        self._flush_fn = flush_fn
+        self._wait_time = wait_time_ms / 1000
+        self._max_rows = max_rows
+        self._pending: List[Tuple[BaseNode, "asyncio.Future[str]"]] = []
+        self._full: Optional[asyncio.Event] = None
+        self._flusher: Optional["asyncio.Future[None]"] = None
+
+    async def submit(self, nodes: Sequence[BaseNode]) -> List[str]:
+        """Submit nodes to the next batch, and wait for their new ids."""
+        if not nodes:
+            return []
+
+        loop = asyncio.get_running_loop()
+        futures: List["asyncio.Future[str]"] = [loop.create_future() for _ in nodes]
+        self._pending.extend(zip(nodes, futures))
+
+        if self._flusher is None or self._flusher.done():
+            # NOTE: created here so that they belong to the running event loop
+            self._full = asyncio.Event()
+            self._flusher = asyncio.ensure_future(self._run_flusher())
+        if len(self._pending) >= self._max_rows:
+            assert self._full is not None
+            self._full.set()
+
+        return list(await asyncio.gather(*futures))
+
+    async def _run_flusher(self) -> None:
+        """Flush pending nodes until there are none left."""
+        assert self._full is not None
+        while self._pending:
+            if len(self._pending) < self._max_rows:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self._wait_time)
+                except asyncio.TimeoutError:
+                    pass
+
+            # NOTE: skip nodes whose submitter was cancelled while waiting, so
+            # they don't end up in the vector store without any bookkeeping
+            self._pending = [
+                (node, future)
+                for node, future in self._pending
+                if not future.cancelled()
+            ]
+            batch = self._pending[: self._max_rows]
+            self._pending = self._pending[self._max_rows :]
+            if not batch:
+                continue
+            try:
+                new_ids = await self._flush_fn([node for node, _ in batch])
+                if len(new_ids) != len(batch):
+                    raise ValueError(
+                        f"Expected {len(batch)} new ids, got {len(new_ids)}."
+                    )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), new_id in zip(batch, new_ids):
+                    if not future.done():
+                        future.set_result(new_id)
+
 
 class MultiModalVectorStoreIndex(VectorStoreIndex):
     """Multi-Modal Vector Store Index.
@@ -34,6 +246,35 @@ class MultiModalVectorStoreIndex(VectorStoreIndex):
         show_progress (bool): Whether to show tqdm progress bars. Defaults to False.
         store_nodes_override (bool): set to True to always store Node objects in index
             store and document store even if vector store keeps text. Defaults to False
+        embed_batch_size (int): number of nodes sent to the embed model per call
+            when embedding asynchronously. Defaults to 100.
+        max_concurrent_embed_batches (int): maximum number of embedding batches
+            in flight at once when embedding asynchronously. Defaults to 5.
+        image_embed_cache_size (int): maximum number of image embeddings kept in an
+            LRU cache keyed by image content (image urls are keyed by url), so
+            repeated images are only embedded once. Set to 0 to disable the cache.
+            Defaults to 1024.
+        image_embedding_dtype (str): dtype image embeddings are quantized to
+            before being added to the image vector store, one of "fp32", "fp16" or
+            "int8". The image vector store should be configured for the same dtype;
+            "int8" drops the per-embedding scale, so it should only be used with
+            cosine similarity. Defaults to "fp32".
+        async_insert_batching (bool): set to True to coalesce nodes from concurrent
+            `ainsert_nodes` calls into shared embed and vector store calls. Inserts
+            with extra insert kwargs are never coalesced. Defaults to False.
+        async_insert_wait_time_ms (int): how long a batch waits for more nodes
+            before being flushed, when async insert batching is enabled.
+            Defaults to 50.
+        async_insert_max_rows (int): max number of nodes in a batch, when async
+            insert batching is enabled. Defaults to 256.
+        image_resolve_workers (Optional[int]): number of threads images are
+            resolved in when embedding asynchronously, so that fetching image urls
+            doesn't block the event loop. Defaults to the ThreadPoolExecutor default.
+        defer_async_bookkeeping (bool): set to True to have `ainsert_nodes` return
+            once the nodes are in the vector stores, and update the index struct and
+            document store in a background thread. Inserts, deletes and
+            `as_retriever` wait for it, and `aflush` can be awaited to wait for it
+            explicitly. Defaults to False.
     """
 
     image_namespace = "image"
@@ -51,11 +292,67 @@ class MultiModalVectorStoreIndex(VectorStoreIndex):
         # Image-related kwargs
         image_vector_store: Optional[VectorStore] = None,
         image_embed_model: EmbedType = "clip",
+        embed_batch_size: int = 100,
+        max_concurrent_embed_batches: int = 5,
+        image_embed_cache_size: int = 1024,
+        image_embedding_dtype: EmbeddingDType = "fp32",
+        async_insert_batching: bool = False,
+        async_insert_wait_time_ms: int = 50,
+        async_insert_max_rows: int = 256,
+        image_resolve_workers: Optional[int] = None,
+        defer_async_bookkeeping: bool = False,
         **kwargs: Any,
     ) -> None:
         """Initialize params."""
-        image_embed_model = resolve_embed_model(image_embed_model)
-        assert isinstance(image_embed_model, MultiModalEmbedding)
+        if embed_batch_size < 1:
+            raise ValueError("embed_batch_size must be at least 1.")
+        if max_concurrent_embed_batches < 1:
+            raise ValueError("max_concurrent_embed_batches must be at least 1.")
+        if async_insert_max_rows < 1:
+            raise ValueError("async_insert_max_rows must be at least 1.")
+        if async_insert_wait_time_ms < 0:
+            raise ValueError("async_insert_wait_time_ms must not be negative.")
+        if image_embedding_dtype not in get_args(EmbeddingDType):
+            raise ValueError(f"Invalid image_embedding_dtype: {image_embedding_dtype}")
+        self._embed_batch_size = embed_batch_size
+        self._max_concurrent_embed_batches = max_concurrent_embed_batches
+
+        self._image_embed_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._image_embed_cache_size = image_embed_cache_size
+        self._image_embed_cache_lock = threading.Lock()
+        self._image_embedding_dtype = image_embedding_dtype
+        if image_embedding_dtype == "int8":
+            # NOTE: compile the int8 kernel (if any) now, rather than blocking the
+            # event loop on the first async insert
+            quantize_embeddings(np.zeros((1, 1)), "int8")
+        # NOTE: threads are only started once images are resolved
+        self._image_resolve_executor = ThreadPoolExecutor(
+            max_workers=image_resolve_workers
+        )
+
+        # NOTE: a single worker keeps the deferred bookkeeping in insert order
+        self._bookkeeping_executor = (
+            ThreadPoolExecutor(max_workers=1) if defer_async_bookkeeping else None
+        )
+        self._pending_bookkeeping: List["Future[None]"] = []
+
+        self._async_insert_batching = async_insert_batching
+        self._text_insert_batcher = _AsyncInsertBatcher(
+            partial(self._async_add_batched_nodes, is_image=False),
+            wait_time_ms=async_insert_wait_time_ms,
+            max_rows=async_insert_max_rows,
+        )
+        self._image_insert_batcher = _AsyncInsertBatcher(
+            partial(self._async_add_batched_nodes, is_image=True),
+            wait_time_ms=async_insert_wait_time_ms,
+            max_rows=async_insert_max_rows,
+        )
+
+        if isinstance(image_embed_model, str):
+            image_embed_model = _resolve_image_embed_model_from_str(image_embed_model)
+        else:
+            image_embed_model = resolve_embed_model(image_embed_model)
+            assert isinstance(image_embed_model, MultiModalEmbedding)
         self._image_embed_model = image_embed_model
 
         storage_context = storage_context or StorageContext.from_defaults()
@@ -93,12 +390,22 @@ class MultiModalVectorStoreIndex(VectorStoreIndex):
             MultiModalVectorIndexRetriever,
         )
 
+        self._wait_for_bookkeeping()
         return MultiModalVectorIndexRetriever(
             self,
-            node_ids=list(self.index_struct.nodes_dict.values()),
+            node_ids=self._node_ids,
             **kwargs,
         )
 
+    @cached_property
+    def _node_ids(self) -> List[str]:
+        """Ids of the nodes in the index struct, cached across retrievers."""
+        return list(self.index_struct.nodes_dict.values())
+
+    def _invalidate_node_ids(self) -> None:
+        """Invalidate the cached node ids, after the index struct changes."""
+        self.__dict__.pop("_node_ids", None)
+
     @classmethod
     def from_vector_store(
         cls,
@@ -124,38 +431,241 @@ class MultiModalVectorStoreIndex(VectorStoreIndex):
             **kwargs,
         )
 
-    def _get_node_with_embedding(
+    def _get_dedupe_keys(
+        self, nodes: Sequence[BaseNode], is_image: bool = False
+    ) -> List[Optional[str]]:
+        """Get the keys nodes are deduplicated by, aligned with the nodes.
+
+        Nodes that already have an embedding get no key. Image nodes are keyed by
+        content when the image embedding cache is enabled, since the same key is
+        used to look them up in the cache, and by reference otherwise, so images
+        aren't read just to be deduplicated.
+
+        """
+        if not is_image:
+            return [
+                _get_text_key(node) if node.embedding is None else None
+                for node in nodes
+            ]
+
+        get_key = (
+            _get_image_content_key
+            if self._image_embed_cache_size > 0
+            else _get_image_ref_key
+        )
+        return [
+            get_key(node)
+            if isinstance(node, ImageNode) and node.embedding is None
+            else None
+            for node in nodes
+        ]
+
+    async def _aget_dedupe_keys(
+        self, nodes: Sequence[BaseNode], is_image: bool = False
+    ) -> List[Optional[str]]:
+        """Asynchronously get the keys nodes are deduplicated by.
+
+        Image content keys read image files, so they are computed in the image
+        resolve executor rather than on the event loop.
+
+        """
+        if not is_image or self._image_embed_cache_size <= 0:
+            return self._get_dedupe_keys(nodes, is_image=is_image)
+        return await asyncio.get_running_loop().run_in_executor(
+            self._image_resolve_executor, self._get_dedupe_keys, nodes, True
+        )
+
+    def _get_cached_image_embeddings(
+        self, keys: Sequence[Optional[str]]
+    ) -> Tuple[Dict[int, List[float]], List[int]]:
+        """Look up image nodes in the image embedding cache by their keys.
+
+        Returns the cached embeddings keyed by node position, and the positions of
+        the nodes that still need to be embedded.
+
+        """
+        if self._image_embed_cache_size <= 0:
+            return {}, list(range(len(keys)))
+
+        cached_embeddings: Dict[int, List[float]] = {}
+        positions_to_embed: List[int] = []
+        with self._image_embed_cache_lock:
+            for i, key in enumerate(keys):
+                if key is not None and key in self._image_embed_cache:
+                    self._image_embed_cache.move_to_end(key)
+                    cached_embeddings[i] = self._image_embed_cache[key]
+                else:
+                    positions_to_embed.append(i)
+        return cached_embeddings, positions_to_embed
+
+    def _cache_image_embeddings(
+        self, keys: Sequence[Optional[str]], embeddings: np.ndarray
+    ) -> None:
+        """Add newly computed image embeddings to the image embedding cache."""
+        if self._image_embed_cache_size <= 0:
+            return
+
+        with self._image_embed_cache_lock:
+            for key, embedding in zip(keys, embeddings.tolist()):
+                # NOTE: nodes that came with an embedding have no key
+                if key is None:
+                    continue
+                self._image_embed_cache[key] = embedding
+                self._image_embed_cache.move_to_end(key)
+                if len(self._image_embed_cache) > self._image_embed_cache_size:
+                    self._image_embed_cache.popitem(last=False)
+
+    def _merge_image_embeddings(
+        self,
+        keys: Sequence[Optional[str]],
+        cached_embeddings: Dict[int, List[float]],
+        positions_to_embed: List[int],
+        new_embeddings: np.ndarray,
+    ) -> np.ndarray:
+        """Merge cached and newly computed image embeddings into one array.
+
+        Newly computed embeddings are added to the cache, and the merged embeddings
+        are quantized to the configured image embedding dtype.
+
+        """
+        self._cache_image_embeddings(
+            [keys[i] for i in positions_to_embed], new_embeddings
+        )
+
+        embeddings = new_embeddings
+        if cached_embeddings:
+            embed_dim = len(next(iter(cached_embeddings.values())))
+            embeddings = np.empty((len(keys), embed_dim))
+            embeddings[list(cached_embeddings.keys())] = list(
+                cached_embeddings.values()
+            )
+            if positions_to_embed:
+                embeddings[positions_to_embed] = new_embeddings
+
+        if self._image_embedding_dtype == "fp32":
+            return embeddings
+        return quantize_embeddings(embeddings, self._image_embedding_dtype)
+
+    def _get_embeddings(
         self,
         nodes: Sequence[BaseNode],
         show_progress: bool = False,
         is_image: bool = False,
-    ) -> List[BaseNode]:
-        """Get tuples of id, node, and embedding.
+    ) -> np.ndarray:
+        """Get the embeddings of nodes as an (N, D) array, aligned with the nodes.
 
-        Allows us to store these nodes in a vector store.
-        Embeddings are called in batches.
+        Embeddings are called in batches, and nodes with the same content are only
+        embedded once.
 
         """
+        unique_nodes, keys, inverse = _dedupe_nodes(
+            nodes, self._get_dedupe_keys(nodes, is_image=is_image)
+        )
         if is_image:
-            id_to_embed_map = embed_image_nodes(
-                nodes,
+            cached_embeddings, positions_to_embed = self._get_cached_image_embeddings(
+                keys
+            )
+            new_embeddings = embed_image_nodes_array(
+                [unique_nodes[i] for i in positions_to_embed],
                 embed_model=self._image_embed_model,
                 show_progress=show_progress,
             )
+            embeddings = self._merge_image_embeddings(
+                keys, cached_embeddings, positions_to_embed, new_embeddings
+            )
         else:
-            id_to_embed_map = embed_nodes(
-                nodes,
+            embeddings = embed_nodes_array(
+                unique_nodes,
                 embed_model=self._service_context.embed_model,
                 show_progress=show_progress,
             )
 
-        results = []
-        for node in nodes:
-            embedding = id_to_embed_map[node.node_id]
-            result = node.copy()
-            result.embedding = embedding
-            results.append(result)
-        return results
+        if inverse is not None:
+            # fan the embeddings of the unique nodes back out to their duplicates
+            embeddings = embeddings[inverse]
+        return embeddings
+
+    def _get_node_with_embedding(
+        self,
+        nodes: Sequence[BaseNode],
+        show_progress: bool = False,
+        is_image: bool = False,
+    ) -> List[BaseNode]:
+        """Get tuples of id, node, and embedding.
+
+        Allows us to store these nodes in a vector store.
+
+        """
+        embeddings = self._get_embeddings(nodes, show_progress, is_image=is_image)
+
+        # NOTE: embeddings are aligned with the nodes, so no lookup by id is needed
+        return [
+            _attach_embedding(node, embedding)
+            for node, embedding in zip(nodes, embeddings.tolist())
+        ]
+
+    async def _aget_embeddings(
+        self,
+        nodes: Sequence[BaseNode],
+        show_progress: bool = False,
+        is_image: bool = False,
+        keys: Optional[Sequence[Optional[str]]] = None,
+    ) -> np.ndarray:
+        """Asynchronously get the embeddings of nodes as an (N, D) array.
+
+        Embeddings are called in batches, with up to
+        `max_concurrent_embed_batches` batches in flight at once, and nodes with
+        the same content are only embedded once. The dedupe keys of the nodes can
+        be passed in if they were already computed.
+
+        """
+        semaphore = asyncio.Semaphore(self._max_concurrent_embed_batches)
+
+        async def embed_batch(batch: Sequence[BaseNode]) -> np.ndarray:
+            async with semaphore:
+                if is_image:
+                    return await async_embed_image_nodes_array(
+                        batch,
+                        embed_model=self._image_embed_model,
+                        show_progress=show_progress,
+                        executor=self._image_resolve_executor,
+                    )
+                return await async_embed_nodes_array(
+                    batch,
+                    embed_model=self._service_context.embed_model,
+                    show_progress=show_progress,
+                )
+
+        if keys is None:
+            keys = await self._aget_dedupe_keys(nodes, is_image=is_image)
+        unique_nodes, keys, inverse = _dedupe_nodes(nodes, keys)
+        cached_embeddings: Dict[int, List[float]] = {}
+        positions_to_embed = list(range(len(unique_nodes)))
+        if is_image:
+            cached_embeddings, positions_to_embed = self._get_cached_image_embeddings(
+                keys
+            )
+        nodes_to_embed = [unique_nodes[i] for i in positions_to_embed]
+
+        batch_embeddings = await asyncio.gather(
+            *[
+                embed_batch(nodes_to_embed[i : i + self._embed_batch_size])
+                for i in range(0, len(nodes_to_embed), self._embed_batch_size)
+            ]
+        )
+        embeddings = (
+            np.concatenate(batch_embeddings) if batch_embeddings else np.empty((0, 0))
+        )
+
+        if is_image:
+            embeddings = self._merge_image_embeddings(
+                keys, cached_embeddings, positions_to_embed, embeddings
+            )
+
+        if inverse is not None:
+            # fan the embeddings of the unique nodes back out to their duplicates
+            embeddings = embeddings[inverse]
+        return embeddings
 
     async def _aget_node_with_embedding(
         self,
@@ -166,29 +676,309 @@ class MultiModalVectorStoreIndex(VectorStoreIndex):
         """Asynchronously get tuples of id, node, and embedding.
 
         Allows us to store these nodes in a vector store.
-        Embeddings are called in batches.
 
         """
-        if is_image:
-            id_to_embed_map = await async_embed_image_nodes(
-                nodes,
-                embed_model=self._image_embed_model,
-                show_progress=show_progress,
+        embeddings = await self._aget_embeddings(
+            nodes, show_progress, is_image=is_image
+        )
+
+        # NOTE: embeddings are aligned with the nodes, so no lookup by id is needed
+        return [
+            _attach_embedding(node, embedding)
+            for node, embedding in zip(nodes, embeddings.tolist())
+        ]
+
+    def _add_nodes_to_vector_store(
+        self,
+        nodes: Sequence[BaseNode],
+        vector_store: VectorStore,
+        show_progress: bool = False,
+        is_image: bool = False,
+        **insert_kwargs: Any,
+    ) -> List[str]:
+        """Embed nodes and add them to a vector store.
+
+        Returns the ids assigned by the vector store, in the order of the nodes.
+
+        """
+        # NOTE: most inserts are all text or all images, so skip the embed and add
+        # calls for the empty partition entirely
+        if not nodes:
+            return []
+
+        # NOTE: subclasses may override add, so only the exact class is bypassed
+        if type(vector_store) is SimpleVectorStore:
+            # NOTE: hand the embeddings array to the store directly, rather than
+            # attaching each embedding to a copy of its node
+            embeddings = self._get_embeddings(nodes, show_progress, is_image=is_image)
+            return vector_store.add_embeddings_bulk(nodes, embeddings)
+
+        nodes_with_embedding = self._get_node_with_embedding(
+            nodes, show_progress, is_image=is_image
+        )
+        return vector_store.add(nodes_with_embedding, **insert_kwargs)
+
+    async def _async_add_nodes_to_vector_store(
+        self,
+        nodes: Sequence[BaseNode],
+        vector_store: VectorStore,
+        show_progress: bool = False,
+        is_image: bool = False,
+        **insert_kwargs: Any,
+    ) -> List[str]:
+        """Asynchronously embed nodes and add them to a vector store.
+
+        Nodes are streamed through a bounded embed -> insert pipeline in chunks, so
+        that only a few embedded chunks are held in memory at once and embedding the
+        next chunk overlaps with adding the previous one to the vector store.
+
+        Vector stores that embed nodes themselves, by setting a truthy
+        `supports_server_side_embed` attribute and implementing
+        `async_add_with_embed(nodes, modality=...)`, are handed copies of the nodes
+        without an embedding instead, skipping the embed round-trip.
+
+        Returns the ids assigned by the vector store, in the order of the nodes.
+
+        """
+        # NOTE: see _add_nodes_to_vector_store
+        if not nodes:
+            return []
+
+        # NOTE: probed rather than part of the VectorStore protocol, so stores
+        # that don't opt in are unaffected
+        async_add_with_embed = getattr(vector_store, "async_add_with_embed", None)
+        if async_add_with_embed is None or not getattr(
+            vector_store, "supports_server_side_embed", False
+        ):
+            return await self._async_embed_and_add_nodes(
+                nodes, vector_store, show_progress, is_image=is_image, **insert_kwargs
             )
-        else:
-            id_to_embed_map = await async_embed_nodes(
-                nodes,
-                embed_model=self._service_context.embed_model,
-                show_progress=show_progress,
+
+        # NOTE: nodes that come with an embedding keep it, so only the others
+        # are embedded by the store. The store gets copies, since it may set
+        # their embeddings.
+        new_ids: List[str] = [""] * len(nodes)
+        positions_to_embed = [
+            i for i, node in enumerate(nodes) if node.embedding is None
+        ]
+        if positions_to_embed:
+            embedded_ids = await async_add_with_embed(
+                [nodes[i].copy() for i in positions_to_embed],
+                modality="image" if is_image else "text",
+                **insert_kwargs,
+            )
+            for i, new_id in zip(positions_to_embed, embedded_ids):
+                new_ids[i] = new_id
+
+        positions_with_embedding = [
+            i for i, node in enumerate(nodes) if node.embedding is not None
+        ]
+        if positions_with_embedding:
+            added_ids = await self._async_embed_and_add_nodes(
+                [nodes[i] for i in positions_with_embedding],
+                vector_store,
+                show_progress,
+                is_image=is_image,
+                **insert_kwargs,
             )
+            for i, new_id in zip(positions_with_embedding, added_ids):
+                new_ids[i] = new_id
+        return new_ids
+
+    async def _async_embed_and_add_nodes(
+        self,
+        nodes: Sequence[BaseNode],
+        vector_store: VectorStore,
+        show_progress: bool = False,
+        is_image: bool = False,
+        **insert_kwargs: Any,
+    ) -> List[str]:
+        """Asynchronously embed nodes and add them to a vector store in chunks.
+
+        Nodes are deduplicated over the whole call before being chunked, so
+        duplicates in different chunks are still only embedded once.
+
+        """
+        unique_nodes, keys, inverse = _dedupe_nodes(
+            nodes, await self._aget_dedupe_keys(nodes, is_image=is_image)
+        )
+        if inverse is None:
+            inverse = list(range(len(nodes)))
+        positions_by_unique_position: List[List[int]] = [[] for _ in unique_nodes]
+        for position, unique_position in enumerate(inverse):
+            positions_by_unique_position[unique_position].append(position)
+
+        # NOTE: each chunk is embedded as up to `max_concurrent_embed_batches`
+        # concurrent batches by _aget_embeddings
+        chunk_size = self._embed_batch_size * self._max_concurrent_embed_batches
+        embed_queue: "asyncio.Queue[Optional[int]]" = asyncio.Queue(
+            maxsize=PIPELINE_QUEUE_SIZE
+        )
+        insert_queue: "asyncio.Queue[Optional[Tuple[List[int], np.ndarray]]]"
+        insert_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        new_ids: List[str] = [""] * len(nodes)
+
+        async def partition() -> None:
+            for start in range(0, len(unique_nodes), chunk_size):
+                await embed_queue.put(start)
+            await embed_queue.put(None)
+
+        async def embed_worker() -> None:
+            while (start := await embed_queue.get()) is not None:
+                end = start + chunk_size
+                embeddings = await self._aget_embeddings(
+                    unique_nodes[start:end],
+                    show_progress,
+                    is_image=is_image,
+                    keys=keys[start:end],
+                )
+                # fan the embeddings of the chunk out to all of its duplicates
+                positions = sorted(
+                    position
+                    for unique_positions in positions_by_unique_position[start:end]
+                    for position in unique_positions
+                )
+                rows = [inverse[position] - start for position in positions]
+                await insert_queue.put((positions, embeddings[rows]))
+            await insert_queue.put(None)
+
+        async def insert_worker() -> None:
+            while (item := await insert_queue.get()) is not None:
+                positions, embeddings = item
+                chunk = [nodes[position] for position in positions]
+                if type(vector_store) is SimpleVectorStore:
+                    # NOTE: see _add_nodes_to_vector_store
+                    chunk_ids = vector_store.add_embeddings_bulk(chunk, embeddings)
+                else:
+                    nodes_with_embedding = [
+                        _attach_embedding(node, embedding)
+                        for node, embedding in zip(chunk, embeddings.tolist())
+                    ]
+                    chunk_ids = await vector_store.async_add(
+                        nodes_with_embedding, **insert_kwargs
+                    )
+                for position, new_id in zip(positions, chunk_ids):
+                    new_ids[position] = new_id
+
+        workers = [
+            asyncio.ensure_future(worker)
+            for worker in (partition(), embed_worker(), insert_worker())
+        ]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            # NOTE: make sure no worker is left blocked on a queue
+            for worker in workers:
+                worker.cancel()
+            raise
+
+        return new_ids
+
+    async def _async_add_batched_nodes(
+        self, nodes: List[BaseNode], is_image: bool = False
+    ) -> List[str]:
+        """Embed and add a batch of coalesced nodes to their vector store."""
+        return await self._async_add_nodes_to_vector_store(
+            nodes,
+            self._image_vector_store if is_image else self._vector_store,
+            self._show_progress,
+            is_image=is_image,
+        )
+
+    def _finalize_bookkeeping(
+        self,
+        index_struct: IndexDict,
+        nodes: Sequence[BaseNode],
+        new_ids: List[str],
+    ) -> None:
+        """Add nodes that were added to the vector stores to the index struct.
+
+        If the vector store doesn't store text, we need to add the nodes to the
+        index struct and document store.
 
-        results = []
-        for node in nodes:
-            embedding = id_to_embed_map[node.node_id]
-            result = node.copy()
-            result.embedding = embedding
-            results.append(result)
-        return results
+        """
+        if self._vector_store.stores_text and not self._store_nodes_override:
+            return
+
+        # NOTE: the input nodes are used here, since the embedded copies were only
+        # needed by the vector stores
+        nodes_without_embedding = []
+        for node, new_id in zip(nodes, new_ids):
+            # NOTE: remove embedding from node to avoid duplication
+            node_without_embedding = _get_node_without_embedding(node)
+
+            index_struct.add_node(node_without_embedding, text_id=new_id)
+            nodes_without_embedding.append(node_without_embedding)
+        self._invalidate_node_ids()
+
+        # NOTE: add to the docstore in a single call, so that backends can
+        # batch the writes
+        self._docstore.add_documents(nodes_without_embedding, allow_update=True)
+
+    def _persist_bookkeeping(
+        self, nodes: Sequence[BaseNode], new_ids: List[str]
+    ) -> None:
+        """Finalize the bookkeeping of an insert, and persist the index struct."""
+        self._finalize_bookkeeping(self._index_struct, nodes, new_ids)
+        self._storage_context.index_store.add_index_struct(self._index_struct)
+
+    def _wait_for_bookkeeping(self) -> None:
+        """Wait for deferred bookkeeping, re-raising the first error it hit."""
+        pending, self._pending_bookkeeping = self._pending_bookkeeping, []
+        for future in pending:
+            future.result()
+
+    async def aflush(self) -> None:
+        """Wait for the bookkeeping of deferred async inserts to finish."""
+        pending, self._pending_bookkeeping = self._pending_bookkeeping, []
+        for future in pending:
+            await asyncio.wrap_future(future)
+
+    async def _async_add_nodes_to_vector_stores(
+        self,
+        nodes: Sequence[BaseNode],
+        show_progress: bool = False,
+        use_batching: bool = False,
+        **insert_kwargs: Any,
+    ) -> Tuple[List[BaseNode], List[str]]:
+        """Asynchronously embed nodes and add them to the text and image stores.
+
+        Returns the nodes that were added, and the ids assigned to them by the
+        vector stores.
+
+        """
+        image_nodes: List[ImageNode] = [
+            node for node in nodes if isinstance(node, ImageNode)
+        ]
+        text_nodes: List[BaseNode] = [node for node in nodes if node.text]
+
+        # embed all nodes as text - incclude image nodes that have text attached,
+        # and embed image nodes as images directly
+        # NOTE: the text and image flows use different embed models and vector
+        # stores, so they can run concurrently
+        if use_batching and not insert_kwargs:
+            new_text_ids, new_img_ids = await asyncio.gather(
+                self._text_insert_batcher.submit(text_nodes),
+                self._image_insert_batcher.submit(image_nodes),
+            )
+        else:
+            new_text_ids, new_img_ids = await asyncio.gather(
+                self._async_add_nodes_to_vector_store(
+                    text_nodes,
+                    self._vector_store,
+                    show_progress,
+                    is_image=False,
+                    **insert_kwargs,
+                ),
+                self._async_add_nodes_to_vector_store(
+                    image_nodes,
+                    self._image_vector_store,
+                    show_progress,
+                    is_image=True,
+                    **insert_kwargs,
+                ),
+            )
+        return text_nodes + image_nodes, new_text_ids + new_img_ids
 
     async def _async_add_nodes_to_index(
         self,
@@ -201,45 +991,11 @@ class MultiModalVectorStoreIndex(VectorStoreIndex):
         if not nodes:
             return
 
-        image_nodes: List[ImageNode] = []
-        text_nodes: List[BaseNode] = []
-
-        for node in nodes:
-            if isinstance(node, ImageNode):
-                image_nodes.append(node)
-            if node.text:
-                text_nodes.append(node)
-
-        # embed all nodes as text - incclude image nodes that have text attached
-        text_nodes = await self._aget_node_with_embedding(
-            text_nodes, show_progress, is_image=False
-        )
-        new_text_ids = await self.storage_context.vector_stores[
-            DEFAULT_VECTOR_STORE
-        ].async_add(text_nodes, **insert_kwargs)
-
-        # embed image nodes as images directly
-        image_nodes = await self._aget_node_with_embedding(
-            image_nodes, show_progress, is_image=True
+        # NOTE: a build has a single caller, so there is nothing to coalesce
+        all_nodes, all_new_ids = await self._async_add_nodes_to_vector_stores(
+            nodes, show_progress, **insert_kwargs
         )
-        new_img_ids = await self.storage_context.vector_stores[
-            self.image_namespace
-        ].async_add(image_nodes, **insert_kwargs)
-
-        # if the vector store doesn't store text, we need to add the nodes to the
-        # index struct and document store
-        all_nodes = text_nodes + image_nodes
-        all_new_ids = new_text_ids + new_img_ids
-        if not self._vector_store.stores_text or self._store_nodes_override:
-            for node, new_id in zip(all_nodes, all_new_ids):
-                # NOTE: remove embedding from node to avoid duplication
-                node_without_embedding = node.copy()
-                node_without_embedding.embedding = None
-
-                index_struct.add_node(node_without_embedding, text_id=new_id)
-                self._docstore.add_documents(
-                    [node_without_embedding], allow_update=True
-                )
+        self._finalize_bookkeeping(index_struct, all_nodes, all_new_ids)
 
     def _add_nodes_to_index(
         self,
@@ -252,61 +1008,146 @@ class MultiModalVectorStoreIndex(VectorStoreIndex):
         if not nodes:
             return
 
-        image_nodes: List[ImageNode] = []
-        text_nodes: List[BaseNode] = []
+        self._wait_for_bookkeeping()
 
-        for node in nodes:
-            if isinstance(node, ImageNode):
-                image_nodes.append(node)
-            if node.text:
-                text_nodes.append(node)
+        image_nodes: List[ImageNode] = [
+            node for node in nodes if isinstance(node, ImageNode)
+        ]
+        text_nodes: List[BaseNode] = [node for node in nodes if node.text]
 
         # embed all nodes as text - incclude image nodes that have text attached
-        text_nodes = self._get_node_with_embedding(
-            text_nodes, show_progress, is_image=False
-        )
-        new_text_ids = self.storage_context.vector_stores[DEFAULT_VECTOR_STORE].add(
-            text_nodes, **insert_kwargs
+        new_text_ids = self._add_nodes_to_vector_store(
+            text_nodes,
+            self._vector_store,
+            show_progress,
+            is_image=False,
+            **insert_kwargs,
         )
 
         # embed image nodes as images directly
-        image_nodes = self._get_node_with_embedding(
-            image_nodes, show_progress, is_image=True
+        new_img_ids = self._add_nodes_to_vector_store(
+            image_nodes,
+            self._image_vector_store,
+            show_progress,
+            is_image=True,
+            **insert_kwargs,
         )
-        new_img_ids = self.storage_context.vector_stores[self.image_namespace].add(
-            image_nodes, **insert_kwargs
+
+        self._finalize_bookkeeping(
+            index_struct, text_nodes + image_nodes, new_text_ids + new_img_ids
         )
 
-        # if the vector store doesn't store text, we need to add the nodes to the
-        # index struct and document store
-        all_nodes = text_nodes + image_nodes
-        all_new_ids = new_text_ids + new_img_ids
-        if not self._vector_store.stores_text or self._store_nodes_override:
-            for node, new_id in zip(all_nodes, all_new_ids):
-                # NOTE: remove embedding from node to avoid duplication
-                node_without_embedding = node.copy()
-                node_without_embedding.embedding = None
-
-                index_struct.add_node(node_without_embedding, text_id=new_id)
-                self._docstore.add_documents(
-                    [node_without_embedding], allow_update=True
-                )
+    async def ainsert_nodes(
+        self, nodes: Sequence[BaseNode], **insert_kwargs: Any
+    ) -> None:
+        """Asynchronously insert nodes.
+
+        With `async_insert_batching`, nodes from concurrent calls are coalesced
+        into shared embed and vector store calls. With `defer_async_bookkeeping`,
+        this returns before the index struct and document store are updated.
+
+        """
+        if not nodes:
+            return
+
+        all_nodes, all_new_ids = await self._async_add_nodes_to_vector_stores(
+            nodes,
+            self._show_progress,
+            use_batching=self._async_insert_batching,
+            **insert_kwargs,
+        )
+        if self._bookkeeping_executor is None:
+            self._persist_bookkeeping(all_nodes, all_new_ids)
+            return
+
+        # surface errors of finished bookkeeping, rather than dropping them
+        done = [future for future in self._pending_bookkeeping if future.done()]
+        self._pending_bookkeeping = [
+            future for future in self._pending_bookkeeping if future not in done
+        ]
+        for future in done:
+            future.result()
+
+        # NOTE: the nodes are already in the vector stores, so the (blocking)
+        # docstore writes can overlap with the caller's next insert. The caller
+        # may reuse its nodes once this returns, so the bookkeeping gets copies.
+        node_copies = [
+            node.copy(update={"embedding": None}, deep=True) for node in all_nodes
+        ]
+        self._pending_bookkeeping.append(
+            self._bookkeeping_executor.submit(
+                self._persist_bookkeeping, node_copies, all_new_ids
+            )
+        )
+
+    def _get_ref_doc_node_ids(self, ref_doc_id: str) -> List[str]:
+        """Get ids of the nodes of a ref doc that have to be deleted one by one."""
+        # NOTE: nodes are only tracked in the index struct and docstore if the
+        # vector store doesn't store text, see _finalize_bookkeeping
+        if self._vector_store.stores_text and not self._store_nodes_override:
+            return []
+
+        ref_doc_info = self._docstore.get_ref_doc_info(ref_doc_id)
+        if ref_doc_info is None:
+            return []
+        return ref_doc_info.node_ids
 
     def delete_ref_doc(
         self, ref_doc_id: str, delete_from_docstore: bool = False, **delete_kwargs: Any
     ) -> None:
         """Delete a document and it's nodes by using ref_doc_id."""
-        # delete from all vector stores
+        # NOTE: pending bookkeeping could otherwise re-add the deleted nodes
+        self._wait_for_bookkeeping()
 
-        for vector_store in self._storage_context.vector_stores.values():
+        node_ids = self._get_ref_doc_node_ids(ref_doc_id)
+        for node_id in node_ids:
+            self._index_struct.delete(node_id)
+        self._invalidate_node_ids()
+
+        def delete_from_vector_store(vector_store: VectorStore) -> None:
             vector_store.delete(ref_doc_id)
+            if vector_store is self._vector_store:
+                for node_id in node_ids:
+                    vector_store.delete(node_id)
+
+        # delete from all vector stores
+        # NOTE: the vector stores are independent, so each one is deleted from in
+        # its own thread, while calls to a single store stay sequential
+        vector_stores = list(self._storage_context.vector_stores.values())
+        with ThreadPoolExecutor(max_workers=min(32, len(vector_stores))) as executor:
+            list(executor.map(delete_from_vector_store, vector_stores))
+
+        if delete_from_docstore:
+            self._docstore.delete_ref_doc(ref_doc_id, raise_error=False)
 
-            if self._store_nodes_override or self._vector_store.stores_text:
-                ref_doc_info = self._docstore.get_ref_doc_info(ref_doc_id)
-                if ref_doc_info is not None:
-                    for node_id in ref_doc_info.node_ids:
-                        self._index_struct.delete(node_id)
-                        self._vector_store.delete(node_id)
+        self._storage_context.index_store.add_index_struct(self._index_struct)
+
+    async def adelete_ref_doc(
+        self, ref_doc_id: str, delete_from_docstore: bool = False, **delete_kwargs: Any
+    ) -> None:
+        """Asynchronously delete a document and it's nodes by using ref_doc_id."""
+        # NOTE: pending bookkeeping could otherwise re-add the deleted nodes
+        await self.aflush()
+
+        node_ids = self._get_ref_doc_node_ids(ref_doc_id)
+        for node_id in node_ids:
+            self._index_struct.delete(node_id)
+        self._invalidate_node_ids()
+
+        async def delete_from_vector_store(vector_store: VectorStore) -> None:
+            await vector_store.adelete(ref_doc_id)
+            if vector_store is self._vector_store:
+                for node_id in node_ids:
+                    await vector_store.adelete(node_id)
+
+        # delete from all vector stores concurrently
+        # NOTE: as in delete_ref_doc, calls to a single store stay sequential
+        await asyncio.gather(
+            *[
+                delete_from_vector_store(vector_store)
+                for vector_store in self._storage_context.vector_stores.values()
+            ]
+        )
 
         if delete_from_docstore:
             self._docstore.delete_ref_doc(ref_doc_id, raise_error=False)
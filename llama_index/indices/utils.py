@@ -1,11 +1,15 @@
 """Utilities for GPT indices."""
+import asyncio
 import logging
 import re
-from typing import Dict, List, Optional, Sequence, Set, Tuple
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Sequence, Set, Tuple, cast
 
-from llama_index.embeddings.base import BaseEmbedding
+import numpy as np
+
+from llama_index.embeddings.base import BaseEmbedding, Embedding
 from llama_index.embeddings.mutli_modal_base import MultiModalEmbedding
-from llama_index.schema import BaseNode, ImageNode, MetadataMode
+from llama_index.schema import BaseNode, ImageNode, ImageType, MetadataMode
 from llama_index.utils import globals_helper, truncate_text
 from llama_index.vector_stores.types import VectorStoreQueryResult
 
@@ -248,3 +252,143 @@ async def async_embed_image_nodes(
         id_to_embed_map[new_id] = img_embedding
 
     return id_to_embed_map
+
+
+def _embeddings_to_array(embeddings: List[Optional[Embedding]]) -> np.ndarray:
+    """Stack embeddings into an (N, D) array."""
+    if not embeddings:
+        return np.empty((0, 0))
+    return np.array(cast(List[Embedding], embeddings))
+
+
+def embed_nodes_array(
+    nodes: Sequence[BaseNode], embed_model: BaseEmbedding, show_progress: bool = False
+) -> np.ndarray:
+    """Get embeddings of the given nodes as an array, run embedding model if necessary.
+
+    Args:
+        nodes (Sequence[BaseNode]): The nodes to embed.
+        embed_model (BaseEmbedding): The embedding model to use.
+        show_progress (bool): Whether to show progress bar.
+
+    Returns:
+        np.ndarray: An (N, D) array of embeddings, aligned with the nodes.
+    """
+    embeddings = [node.embedding for node in nodes]
+    positions_to_embed = [i for i, node in enumerate(nodes) if node.embedding is None]
+
+    new_embeddings = embed_model.get_text_embedding_batch(
+        [
+            nodes[i].get_content(metadata_mode=MetadataMode.EMBED)
+            for i in positions_to_embed
+        ],
+        show_progress=show_progress,
+    )
+
+    for i, text_embedding in zip(positions_to_embed, new_embeddings):
+        embeddings[i] = text_embedding
+
+    return _embeddings_to_array(embeddings)
+
+
+def embed_image_nodes_array(
+    nodes: Sequence[ImageNode],
+    embed_model: MultiModalEmbedding,
+    show_progress: bool = False,
+) -> np.ndarray:
+    """Get image embeddings of the given nodes as an array, run image embedding model
+    if necessary.
+
+    Args:
+        nodes (Sequence[ImageNode]): The nodes to embed.
+        embed_model (MultiModalEmbedding): The embedding model to use.
+        show_progress (bool): Whether to show progress bar.
+
+    Returns:
+        np.ndarray: An (N, D) array of embeddings, aligned with the nodes.
+    """
+    embeddings = [node.embedding for node in nodes]
+    positions_to_embed = [i for i, node in enumerate(nodes) if node.embedding is None]
+
+    new_embeddings = embed_model.get_image_embedding_batch(
+        [nodes[i].resolve_image() for i in positions_to_embed],
+        show_progress=show_progress,
+    )
+
+    for i, img_embedding in zip(positions_to_embed, new_embeddings):
+        embeddings[i] = img_embedding
+
+    return _embeddings_to_array(embeddings)
+
+
+async def async_embed_nodes_array(
+    nodes: Sequence[BaseNode], embed_model: BaseEmbedding, show_progress: bool = False
+) -> np.ndarray:
+    """Async get embeddings of the given nodes as an array, run embedding model if
+    necessary.
+
+    Args:
+        nodes (Sequence[BaseNode]): The nodes to embed.
+        embed_model (BaseEmbedding): The embedding model to use.
+        show_progress (bool): Whether to show progress bar.
+
+    Returns:
+        np.ndarray: An (N, D) array of embeddings, aligned with the nodes.
+    """
+    embeddings = [node.embedding for node in nodes]
+    positions_to_embed = [i for i, node in enumerate(nodes) if node.embedding is None]
+
+    new_embeddings = await embed_model.aget_text_embedding_batch(
+        [
+            nodes[i].get_content(metadata_mode=MetadataMode.EMBED)
+            for i in positions_to_embed
+        ],
+        show_progress=show_progress,
+    )
+
+    for i, text_embedding in zip(positions_to_embed, new_embeddings):
+        embeddings[i] = text_embedding
+
+    return _embeddings_to_array(embeddings)
+
+
+async def async_embed_image_nodes_array(
+    nodes: Sequence[ImageNode],
+    embed_model: MultiModalEmbedding,
+    show_progress: bool = False,
+    executor: Optional[Executor] = None,
+) -> np.ndarray:
+    """Async get image embeddings of the given nodes as an array, run image embedding
+    model if necessary.
+
+    Args:
+        nodes (Sequence[ImageNode]): The nodes to embed.
+        embed_model (MultiModalEmbedding): The embedding model to use.
+        show_progress (bool): Whether to show progress bar.
+        executor (Optional[Executor]): If set, images are resolved in this executor
+            rather than on the event loop, since resolving may fetch image urls.
+
+    Returns:
+        np.ndarray: An (N, D) array of embeddings, aligned with the nodes.
+    """
+    embeddings = [node.embedding for node in nodes]
+    positions_to_embed = [i for i, node in enumerate(nodes) if node.embedding is None]
+
+    def resolve_images() -> List[ImageType]:
+        return [nodes[i].resolve_image() for i in positions_to_embed]
+
+    if executor is not None and positions_to_embed:
+        images = await asyncio.get_running_loop().run_in_executor(
+            executor, resolve_images
+        )
+    else:
+        images = resolve_images()
+
+    new_embeddings = await embed_model.aget_image_embedding_batch(
+        images, show_progress=show_progress
+    )
+
+    for i, img_embedding in zip(positions_to_embed, new_embeddings):
+        embeddings[i] = img_embedding
+
+    return _embeddings_to_array(embeddings)
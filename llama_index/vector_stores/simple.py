@@ -4,9 +4,10 @@ import json
 import logging
 import os
 from dataclasses import dataclass, field
-from typing import Any, Callable, Dict, List, Mapping, Optional, cast
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, cast
 
 import fsspec
+import numpy as np
 from dataclasses_json import DataClassJsonMixin
 
 from llama_index.indices.query.embedding_utils import (
@@ -173,22 +174,52 @@ class SimpleVectorStore(VectorStore):
         """Get embedding."""
         return self._data.embedding_dict[text_id]
 
+    def _add_nodes(
+        self, nodes: Sequence[BaseNode], embeddings: List[List[float]]
+    ) -> List[str]:
+        """Add nodes to index, with the given embeddings aligned with the nodes."""
+        metadatas = []
+        for node in nodes:
+            metadata = node_to_metadata_dict(
+                node, remove_text=True, flat_metadata=False
+            )
+            metadata.pop("_node_content", None)
+            metadatas.append(metadata)
+
+        # NOTE: each dict is updated in a single call, rather than once per node
+        node_ids = [node.node_id for node in nodes]
+        self._data.embedding_dict.update(zip(node_ids, embeddings))
+        self._data.text_id_to_ref_doc_id.update(
+            (node.node_id, node.ref_doc_id or "None") for node in nodes
+        )
+        self._data.metadata_dict.update(zip(node_ids, metadatas))
+        return node_ids
+
     def add(
         self,
         nodes: List[BaseNode],
         **add_kwargs: Any,
     ) -> List[str]:
         """Add nodes to index."""
-        for node in nodes:
-            self._data.embedding_dict[node.node_id] = node.get_embedding()
-            self._data.text_id_to_ref_doc_id[node.node_id] = node.ref_doc_id or "None"
+        return self._add_nodes(nodes, [node.get_embedding() for node in nodes])
 
-            metadata = node_to_metadata_dict(
-                node, remove_text=True, flat_metadata=False
+    def add_embeddings_bulk(
+        self,
+        nodes: Sequence[BaseNode],
+        embeddings: np.ndarray,
+    ) -> List[str]:
+        """Add nodes to index, with their embeddings given as an (N, D) array.
+
+        The embeddings are aligned with the nodes, and take the place of any
+        embeddings attached to the nodes, so nodes don't need to be copied just to
+        carry their embedding.
+
+        """
+        if len(nodes) != len(embeddings):
+            raise ValueError(
+                f"Got {len(nodes)} nodes but {len(embeddings)} embeddings."
             )
-            metadata.pop("_node_content", None)
-            self._data.metadata_dict[node.node_id] = metadata
-        return [node.node_id for node in nodes]
+        return self._add_nodes(nodes, embeddings.tolist())
 
     def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
         """
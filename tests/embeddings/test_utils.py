@@ -1,10 +1,12 @@
 from typing import Any, Dict
 
+import numpy as np
+import pytest
 from llama_index.embeddings import (
     HuggingFaceEmbedding,
     OpenAIEmbedding,
 )
-from llama_index.embeddings.utils import resolve_embed_model
+from llama_index.embeddings.utils import quantize_embeddings, resolve_embed_model
 from llama_index.token_counter.mock_embed_model import MockEmbedding
 from pytest import MonkeyPatch
 
@@ -43,3 +45,41 @@ def test_resolve_embed_model(monkeypatch: MonkeyPatch) -> None:
     # Test BaseEmbedding
     embed_model = resolve_embed_model(OpenAIEmbedding())
     assert isinstance(embed_model, OpenAIEmbedding)
+
+
+def test_quantize_embeddings() -> None:
+    embeddings = np.array([[0.5, -1.0, 0.25], [0.0, 0.0, 0.0]])
+
+    assert quantize_embeddings(embeddings, "fp32").tolist() == embeddings.tolist()
+    assert quantize_embeddings(embeddings, "fp16").tolist() == embeddings.tolist()
+    assert quantize_embeddings(embeddings, "int8").tolist() == [
+        [64, -127, 32],
+        [0, 0, 0],
+    ]
+    assert quantize_embeddings(np.empty((0, 0)), "int8").tolist() == []
+
+
+def test_quantize_embeddings_numba_matches_numpy(monkeypatch: MonkeyPatch) -> None:
+    pytest.importorskip("numba")
+    from llama_index.embeddings import utils as embeddings_utils
+
+    rng = np.random.default_rng(0)
+    # a max of 127 gives a scale of 1, so the other values are exact .5 ties
+    ties = np.arange(-63.5, 64.0, 1.0)
+    tie_rows = np.tile(np.append(ties, 127.0), (8, 1)) * rng.choice([-1, 1], (8, 1))
+    embeddings = np.concatenate(
+        [
+            tie_rows,
+            rng.standard_normal((500, tie_rows.shape[1])),
+            rng.integers(-3, 4, (50, tie_rows.shape[1])) / 2.0,
+            np.zeros((1, tie_rows.shape[1])),
+        ]
+    )
+    assert embeddings_utils._get_numba_int8_quantizer() is not None
+    numba_codes = quantize_embeddings(embeddings, "int8")
+
+    monkeypatch.setattr(embeddings_utils, "_get_numba_int8_quantizer", lambda: None)
+    numpy_codes = quantize_embeddings(embeddings, "int8")
+
+    assert numba_codes.dtype == numpy_codes.dtype == np.int8
+    assert numba_codes.tolist() == numpy_codes.tolist()
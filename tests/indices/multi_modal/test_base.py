@@ -0,0 +1,590 @@
+"""Test multi-modal vector store index."""
+import asyncio
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pytest
+from llama_index.bridge.pydantic import Field
+from llama_index.data_structs.data_structs import IndexDict
+from llama_index.embeddings.mutli_modal_base import MultiModalEmbedding
+from llama_index.indices.multi_modal.base import MultiModalVectorStoreIndex
+from llama_index.indices.multi_modal.retriever import MultiModalVectorIndexRetriever
+from llama_index.indices.service_context import ServiceContext
+from llama_index.schema import (
+    BaseNode,
+    ImageNode,
+    ImageType,
+    NodeRelationship,
+    RelatedNodeInfo,
+)
+from llama_index.vector_stores.simple import SimpleVectorStore
+from pytest import MonkeyPatch
+
+
+class MockMultiModalEmbedding(MultiModalEmbedding):
+    """Mock multi-modal embedding that records which images it embedded."""
+
+    embedded_images: List[str] = Field(default_factory=list)
+    image_batch_sizes: List[int] = Field(default_factory=list)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MockMultiModalEmbedding"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return [0, 0, 1]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return [0, 0, 1]
+
+    def _get_image_embedding(self, img_file_path: ImageType) -> List[float]:
+        assert isinstance(img_file_path, str)
+        self.embedded_images.append(img_file_path)
+        if img_file_path == "a.png":
+            return [1, 0, 0]
+        elif img_file_path == "b.png":
+            return [0, 1, 0]
+        else:
+            return [0, 0, 1]
+
+    async def _aget_image_embedding(self, img_file_path: ImageType) -> List[float]:
+        return self._get_image_embedding(img_file_path)
+
+    async def _aget_image_embeddings(
+        self, img_file_paths: List[ImageType]
+    ) -> List[List[float]]:
+        self.image_batch_sizes.append(len(img_file_paths))
+        return [self._get_image_embedding(path) for path in img_file_paths]
+
+
+class SlowMultiModalEmbedding(MockMultiModalEmbedding):
+    """Mock multi-modal embedding that records how many batches are in flight."""
+
+    in_flight: int = 0
+    max_in_flight: int = 0
+
+    async def _aget_image_embeddings(
+        self, img_file_paths: List[ImageType]
+    ) -> List[List[float]]:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return await super()._aget_image_embeddings(img_file_paths)
+
+
+def test_image_embed_cache(mock_service_context: ServiceContext) -> None:
+    """Test repeated images are only embedded once."""
+    embed_model = MockMultiModalEmbedding()
+    index = MultiModalVectorStoreIndex(
+        nodes=[ImageNode(image_path="a.png")],
+        service_context=mock_service_context,
+        image_embed_model=embed_model,
+    )
+    assert embed_model.embedded_images == ["a.png"]
+
+    new_node = ImageNode(image_path="a.png")
+    index.insert_nodes([new_node, ImageNode(image_path="b.png")])
+    assert embed_model.embedded_images == ["a.png", "b.png"]
+
+    image_vector_store = index.image_vector_store
+    assert isinstance(image_vector_store, SimpleVectorStore)
+    assert image_vector_store.get(new_node.node_id) == [1, 0, 0]
+
+
+def test_image_embed_cache_keys_by_file_content(
+    mock_service_context: ServiceContext, tmp_path: Path
+) -> None:
+    """Test an image file is embedded again once its content changes."""
+    image_path = str(tmp_path / "image.png")
+    Path(image_path).write_bytes(b"first")
+
+    embed_model = MockMultiModalEmbedding()
+    index = MultiModalVectorStoreIndex(
+        nodes=[ImageNode(image_path=image_path)],
+        service_context=mock_service_context,
+        image_embed_model=embed_model,
+    )
+    index.insert_nodes([ImageNode(image_path=image_path)])
+    assert embed_model.embedded_images == [image_path]
+
+    Path(image_path).write_bytes(b"second")
+    index.insert_nodes([ImageNode(image_path=image_path)])
+    assert embed_model.embedded_images == [image_path, image_path]
+
+
+def test_image_embed_cache_disabled(
+    mock_service_context: ServiceContext, monkeypatch: MonkeyPatch
+) -> None:
+    """Test the image embedding cache can be disabled without reading images."""
+
+    def fail(node: ImageNode) -> str:
+        raise AssertionError("image read with the cache disabled")
+
+    monkeypatch.setattr(
+        "llama_index.indices.multi_modal.base._get_image_content_key", fail
+    )
+    embed_model = MockMultiModalEmbedding()
+    index = MultiModalVectorStoreIndex(
+        nodes=[ImageNode(image_path="a.png")],
+        service_context=mock_service_context,
+        image_embed_model=embed_model,
+        image_embed_cache_size=0,
+    )
+    index.insert_nodes([ImageNode(image_path="a.png")])
+    assert embed_model.embedded_images == ["a.png", "a.png"]
+
+
+def test_delete_ref_doc(mock_service_context: ServiceContext) -> None:
+    """Test deleting a ref doc removes it from every vector store."""
+    source = RelatedNodeInfo(node_id="test doc")
+    index = MultiModalVectorStoreIndex(
+        nodes=[
+            ImageNode(
+                text="Hello world.",
+                image_path="a.png",
+                relationships={NodeRelationship.SOURCE: source},
+            ),
+            ImageNode(image_path="b.png"),
+        ],
+        service_context=mock_service_context,
+        image_embed_model=MockMultiModalEmbedding(),
+    )
+    text_vector_store = index.vector_store
+    image_vector_store = index.image_vector_store
+    assert isinstance(text_vector_store, SimpleVectorStore)
+    assert isinstance(image_vector_store, SimpleVectorStore)
+    assert len(text_vector_store._data.embedding_dict) == 1
+    assert len(image_vector_store._data.embedding_dict) == 2
+    assert len(index.index_struct.nodes_dict) == 2
+
+    index.delete_ref_doc("test doc")
+    assert len(text_vector_store._data.embedding_dict) == 0
+    assert len(image_vector_store._data.embedding_dict) == 1
+    assert len(index.index_struct.nodes_dict) == 1
+
+
+class ServerSideEmbedVectorStore(SimpleVectorStore):
+    """Simple vector store that embeds nodes itself."""
+
+    supports_server_side_embed = True
+
+    async def async_add_with_embed(
+        self,
+        nodes: List[BaseNode],
+        modality: str = "text",
+        **kwargs: Any,
+    ) -> List[str]:
+        for node in nodes:
+            assert node.embedding is None
+            node.embedding = [1.0] if modality == "image" else [0.0]
+        return await self.async_add(nodes, **kwargs)
+
+
+def test_adelete_ref_doc(mock_service_context: ServiceContext) -> None:
+    """Test asynchronously deleting a ref doc removes it from the whole index."""
+    source = RelatedNodeInfo(node_id="test doc")
+    index = MultiModalVectorStoreIndex(
+        nodes=[
+            ImageNode(
+                text="Hello world.",
+                image_path="a.png",
+                relationships={NodeRelationship.SOURCE: source},
+            ),
+            ImageNode(image_path="b.png"),
+        ],
+        service_context=mock_service_context,
+        image_embed_model=MockMultiModalEmbedding(),
+    )
+    asyncio.run(index.adelete_ref_doc("test doc"))
+
+    text_vector_store = index.vector_store
+    image_vector_store = index.image_vector_store
+    assert isinstance(text_vector_store, SimpleVectorStore)
+    assert isinstance(image_vector_store, SimpleVectorStore)
+    assert len(text_vector_store._data.embedding_dict) == 0
+    assert len(image_vector_store._data.embedding_dict) == 1
+    assert len(index.index_struct.nodes_dict) == 1
+
+
+class RecordingVectorStore(SimpleVectorStore):
+    """Simple vector store that records the nodes passed to add."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.added_nodes: List[BaseNode] = []
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        self.added_nodes.extend(nodes)
+        return super().add(nodes, **add_kwargs)
+
+
+def test_simple_vector_store_subclass_add(
+    mock_service_context: ServiceContext,
+) -> None:
+    """Test the bulk add shortcut doesn't bypass overrides in subclasses."""
+    image_vector_store = RecordingVectorStore()
+    node = ImageNode(image_path="a.png")
+    MultiModalVectorStoreIndex(
+        nodes=[node],
+        service_context=mock_service_context,
+        image_embed_model=MockMultiModalEmbedding(),
+        image_vector_store=image_vector_store,
+    )
+    assert [n.node_id for n in image_vector_store.added_nodes] == [node.node_id]
+    assert image_vector_store.added_nodes[0].embedding == [1, 0, 0]
+
+
+def test_max_concurrent_embed_batches(mock_service_context: ServiceContext) -> None:
+    """Test async embedding runs batches concurrently, up to the limit."""
+    embed_model = SlowMultiModalEmbedding()
+    MultiModalVectorStoreIndex(
+        nodes=[ImageNode(image_path=f"{i}.png") for i in range(6)],
+        service_context=mock_service_context,
+        image_embed_model=embed_model,
+        use_async=True,
+        embed_batch_size=1,
+        max_concurrent_embed_batches=2,
+    )
+    assert embed_model.image_batch_sizes == [1] * 6
+    assert embed_model.max_in_flight == 2
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"embed_batch_size": 0}, {"max_concurrent_embed_batches": 0}]
+)
+def test_invalid_embed_batching(
+    mock_service_context: ServiceContext, kwargs: Dict[str, Any]
+) -> None:
+    """Test batch sizes and concurrency limits below 1 are rejected."""
+    with pytest.raises(ValueError):
+        MultiModalVectorStoreIndex(
+            nodes=[],
+            service_context=mock_service_context,
+            image_embed_model=MockMultiModalEmbedding(),
+            **kwargs,
+        )
+
+
+def test_build_async(mock_service_context: ServiceContext) -> None:
+    """Test building the index asynchronously over several embedding chunks."""
+    nodes = [
+        ImageNode(text="Hello world.", image_path="a.png"),
+        ImageNode(image_path="b.png"),
+        ImageNode(image_path="c.png"),
+    ]
+    index = MultiModalVectorStoreIndex(
+        nodes=nodes,
+        service_context=mock_service_context,
+        image_embed_model=MockMultiModalEmbedding(),
+        use_async=True,
+        embed_batch_size=1,
+        max_concurrent_embed_batches=1,
+    )
+    text_vector_store = index.vector_store
+    image_vector_store = index.image_vector_store
+    assert isinstance(text_vector_store, SimpleVectorStore)
+    assert isinstance(image_vector_store, SimpleVectorStore)
+    assert text_vector_store.get(nodes[0].node_id) == [1, 0, 0, 0, 0]
+    assert image_vector_store.get(nodes[0].node_id) == [1, 0, 0]
+    assert image_vector_store.get(nodes[1].node_id) == [0, 1, 0]
+    assert image_vector_store.get(nodes[2].node_id) == [0, 0, 1]
+    # text and image nodes are both tracked in the index struct
+    assert len(index.index_struct.nodes_dict) == 3
+
+
+def test_async_insert_batching(mock_service_context: ServiceContext) -> None:
+    """Test concurrent async inserts are embedded in a single batch."""
+    embed_model = MockMultiModalEmbedding()
+    index = MultiModalVectorStoreIndex(
+        nodes=[],
+        service_context=mock_service_context,
+        image_embed_model=embed_model,
+        async_insert_batching=True,
+    )
+    nodes = [ImageNode(image_path="a.png"), ImageNode(image_path="b.png")]
+
+    async def insert_concurrently() -> None:
+        await asyncio.gather(
+            index.ainsert_nodes(nodes[:1]),
+            index.ainsert_nodes(nodes[1:]),
+        )
+
+    asyncio.run(insert_concurrently())
+    assert embed_model.image_batch_sizes == [2]
+
+    image_vector_store = index.image_vector_store
+    assert isinstance(image_vector_store, SimpleVectorStore)
+    assert image_vector_store.get(nodes[0].node_id) == [1, 0, 0]
+    assert image_vector_store.get(nodes[1].node_id) == [0, 1, 0]
+    assert index.index_struct.nodes_dict == {
+        nodes[0].node_id: nodes[0].node_id,
+        nodes[1].node_id: nodes[1].node_id,
+    }
+    # the inserts are persisted to the index store
+    index_struct = index.storage_context.index_store.get_index_struct(index.index_id)
+    assert isinstance(index_struct, IndexDict)
+    assert len(index_struct.nodes_dict) == 2
+
+
+def test_async_build_skips_insert_batching(
+    mock_service_context: ServiceContext,
+) -> None:
+    """Test an async build doesn't wait for other inserts to coalesce with."""
+    start = time.perf_counter()
+    MultiModalVectorStoreIndex(
+        nodes=[ImageNode(image_path="a.png")],
+        service_context=mock_service_context,
+        image_embed_model=MockMultiModalEmbedding(),
+        use_async=True,
+        async_insert_batching=True,
+        async_insert_wait_time_ms=10_000,
+    )
+    assert time.perf_counter() - start < 5
+
+
+def test_async_insert_batching_cancelled(
+    mock_service_context: ServiceContext,
+) -> None:
+    """Test nodes of a cancelled insert are dropped from the pending batch."""
+    embed_model = MockMultiModalEmbedding()
+    index = MultiModalVectorStoreIndex(
+        nodes=[],
+        service_context=mock_service_context,
+        image_embed_model=embed_model,
+        async_insert_batching=True,
+        async_insert_wait_time_ms=100,
+    )
+    node = ImageNode(image_path="a.png")
+
+    async def cancel_insert() -> None:
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(index.ainsert_nodes([node]), 0.01)
+        # give the batch time to flush
+        await asyncio.sleep(0.2)
+
+    asyncio.run(cancel_insert())
+    assert embed_model.embedded_images == []
+    image_vector_store = index.image_vector_store
+    assert isinstance(image_vector_store, SimpleVectorStore)
+    assert node.node_id not in image_vector_store._data.embedding_dict
+
+
+def test_invalid_async_insert_batching(mock_service_context: ServiceContext) -> None:
+    """Test batch sizes below 1 and negative wait times are rejected."""
+    with pytest.raises(ValueError):
+        MultiModalVectorStoreIndex(
+            nodes=[],
+            service_context=mock_service_context,
+            image_embed_model=MockMultiModalEmbedding(),
+            async_insert_max_rows=0,
+        )
+    with pytest.raises(ValueError):
+        MultiModalVectorStoreIndex(
+            nodes=[],
+            service_context=mock_service_context,
+            image_embed_model=MockMultiModalEmbedding(),
+            async_insert_wait_time_ms=-1,
+        )
+
+
+def test_image_embedding_dtype(mock_service_context: ServiceContext) -> None:
+    """Test image embeddings are quantized before being stored."""
+    node = ImageNode(image_path="a.png")
+    index = MultiModalVectorStoreIndex(
+        nodes=[node],
+        service_context=mock_service_context,
+        image_embed_model=MockMultiModalEmbedding(),
+        image_embedding_dtype="int8",
+    )
+    image_vector_store = index.image_vector_store
+    assert isinstance(image_vector_store, SimpleVectorStore)
+    assert image_vector_store.get(node.node_id) == [127, 0, 0]
+
+
+def test_invalid_image_embedding_dtype(mock_service_context: ServiceContext) -> None:
+    """Test unknown image embedding dtypes are rejected before anything is stored."""
+    with pytest.raises(ValueError):
+        MultiModalVectorStoreIndex(
+            nodes=[ImageNode(image_path="a.png")],
+            service_context=mock_service_context,
+            image_embed_model=MockMultiModalEmbedding(),
+            image_embedding_dtype="bf16",  # type: ignore[arg-type]
+        )
+
+
+def test_retriever_node_ids_cache(mock_service_context: ServiceContext) -> None:
+    """Test retriever node ids are cached and refreshed on insert and delete."""
+    source = RelatedNodeInfo(node_id="test doc")
+    index = MultiModalVectorStoreIndex(
+        nodes=[
+            ImageNode(
+                image_path="a.png", relationships={NodeRelationship.SOURCE: source}
+            )
+        ],
+        service_context=mock_service_context,
+        image_embed_model=MockMultiModalEmbedding(),
+    )
+
+    def get_retriever_node_ids() -> Optional[List[str]]:
+        retriever = index.as_retriever()
+        assert isinstance(retriever, MultiModalVectorIndexRetriever)
+        return retriever._node_ids
+
+    node_ids = get_retriever_node_ids()
+    assert node_ids is not None
+    assert len(node_ids) == 1
+    assert get_retriever_node_ids() is node_ids
+
+    node = ImageNode(image_path="b.png")
+    index.insert_nodes([node])
+    node_ids = get_retriever_node_ids()
+    assert node_ids is not None
+    assert len(node_ids) == 2
+
+    # regression: deleting a ref doc must drop its nodes from the index struct
+    index.delete_ref_doc("test doc")
+    assert get_retriever_node_ids() == [node.node_id]
+
+
+def test_build_async_server_side_embed(
+    mock_service_context: ServiceContext,
+) -> None:
+    """Test the embed round-trip is skipped for stores that embed nodes."""
+    image_embed_model = MockMultiModalEmbedding()
+    image_vector_store = ServerSideEmbedVectorStore()
+    nodes = [
+        ImageNode(image_path="a.png"),
+        ImageNode(image_path="b.png", embedding=[0.0, 0.0, 1.0]),
+        ImageNode(image_path="c.png"),
+    ]
+    index = MultiModalVectorStoreIndex(
+        nodes=nodes,
+        service_context=mock_service_context,
+        image_embed_model=image_embed_model,
+        image_vector_store=image_vector_store,
+        use_async=True,
+    )
+    assert index.image_vector_store is image_vector_store
+    assert image_embed_model.embedded_images == []
+    assert image_vector_store.get(nodes[0].node_id) == [1.0]
+    # precomputed embeddings are kept, rather than embedded by the store
+    assert image_vector_store.get(nodes[1].node_id) == [0.0, 0.0, 1.0]
+    assert image_vector_store.get(nodes[2].node_id) == [1.0]
+    # the store embeds copies, leaving the inserted nodes as they were
+    assert nodes[0].embedding is None
+    assert nodes[2].embedding is None
+
+
+def test_dedupe_nodes_in_batch(mock_service_context: ServiceContext) -> None:
+    """Test nodes with the same content are only embedded once per batch."""
+    embed_model = MockMultiModalEmbedding()
+    nodes = [
+        ImageNode(image_path="a.png"),
+        ImageNode(image_path="b.png"),
+        ImageNode(image_path="a.png"),
+    ]
+    index = MultiModalVectorStoreIndex(
+        nodes=nodes,
+        service_context=mock_service_context,
+        image_embed_model=embed_model,
+        image_embed_cache_size=0,
+    )
+    assert embed_model.embedded_images == ["a.png", "b.png"]
+
+    image_vector_store = index.image_vector_store
+    assert isinstance(image_vector_store, SimpleVectorStore)
+    assert image_vector_store.get(nodes[0].node_id) == [1, 0, 0]
+    assert image_vector_store.get(nodes[1].node_id) == [0, 1, 0]
+    assert image_vector_store.get(nodes[2].node_id) == [1, 0, 0]
+
+
+def test_dedupe_nodes_across_async_chunks(
+    mock_service_context: ServiceContext,
+) -> None:
+    """Test async inserts dedupe nodes over the whole call, not per chunk."""
+    embed_model = MockMultiModalEmbedding()
+    nodes = [
+        ImageNode(image_path="a.png"),
+        ImageNode(image_path="b.png"),
+        ImageNode(image_path="a.png"),
+        ImageNode(image_path="c.png"),
+        ImageNode(image_path="b.png"),
+    ]
+    index = MultiModalVectorStoreIndex(
+        nodes=nodes,
+        service_context=mock_service_context,
+        image_embed_model=embed_model,
+        image_embed_cache_size=0,
+        use_async=True,
+        embed_batch_size=1,
+        max_concurrent_embed_batches=1,
+    )
+    assert embed_model.embedded_images == ["a.png", "b.png", "c.png"]
+
+    image_vector_store = index.image_vector_store
+    assert isinstance(image_vector_store, SimpleVectorStore)
+    assert [image_vector_store.get(node.node_id) for node in nodes] == [
+        [1, 0, 0],
+        [0, 1, 0],
+        [1, 0, 0],
+        [0, 0, 1],
+        [0, 1, 0],
+    ]
+    assert len(index.index_struct.nodes_dict) == 5
+
+
+def test_defer_async_bookkeeping(mock_service_context: ServiceContext) -> None:
+    """Test deferred bookkeeping is applied and persisted after async inserts."""
+    source = RelatedNodeInfo(node_id="test doc")
+    nodes = [
+        ImageNode(image_path="a.png"),
+        ImageNode(image_path="b.png", relationships={NodeRelationship.SOURCE: source}),
+    ]
+    index = MultiModalVectorStoreIndex(
+        nodes=nodes[:1],
+        service_context=mock_service_context,
+        image_embed_model=MockMultiModalEmbedding(),
+        defer_async_bookkeeping=True,
+    )
+
+    async def insert_and_flush() -> None:
+        await index.ainsert_nodes(nodes[1:])
+        image_vector_store = index.image_vector_store
+        assert isinstance(image_vector_store, SimpleVectorStore)
+        assert image_vector_store.get(nodes[1].node_id) == [0, 1, 0]
+        await index.aflush()
+
+    asyncio.run(insert_and_flush())
+    assert len(index.index_struct.nodes_dict) == 2
+    assert index.docstore.get_node(nodes[1].node_id).node_id == nodes[1].node_id
+    index_struct = index.storage_context.index_store.get_index_struct(index.index_id)
+    assert isinstance(index_struct, IndexDict)
+    assert len(index_struct.nodes_dict) == 2
+
+    # the bookkeeping stores the nodes as they were inserted, even if the caller
+    # changes them before it runs
+    assert index._bookkeeping_executor is not None
+    released = threading.Event()
+    index._bookkeeping_executor.submit(released.wait)
+    node = ImageNode(image_path="d.png", metadata={"version": 1})
+
+    async def insert_and_mutate() -> None:
+        await index.ainsert_nodes([node])
+        node.metadata["version"] = 2
+        released.set()
+        await index.aflush()
+
+    asyncio.run(insert_and_mutate())
+    assert index.docstore.get_node(node.node_id).metadata == {"version": 1}
+
+    # deletes wait for pending bookkeeping, so it can't re-add deleted nodes
+    asyncio.run(index.ainsert_nodes([ImageNode(image_path="c.png")]))
+    index.delete_ref_doc("test doc")
+    assert nodes[1].node_id not in index.index_struct.nodes_dict
+    assert len(index.index_struct.nodes_dict) == 3
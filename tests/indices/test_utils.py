@@ -1,5 +1,12 @@
 """Test indices/utils.py."""
-from llama_index.indices.utils import expand_tokens_with_subtokens
+from llama_index.indices.utils import (
+    embed_nodes,
+    embed_nodes_array,
+    expand_tokens_with_subtokens,
+)
+from llama_index.schema import TextNode
+
+from tests.indices.vector_store.mock_services import MockEmbedding
 
 
 def test_expand_tokens_with_subtokens() -> None:
@@ -16,3 +23,33 @@ def test_expand_tokens_with_subtokens() -> None:
         "world",
         "bye",
     }
+
+
+def test_embed_nodes_array() -> None:
+    """Test embeddings are aligned with the nodes, keeping existing embeddings."""
+    nodes = [
+        TextNode(text="Hello world."),
+        TextNode(text="This is a test.", embedding=[0, 0, 0, 0, 1]),
+        TextNode(text="This is another test."),
+    ]
+    embeddings = embed_nodes_array(nodes, MockEmbedding())
+    assert embeddings.shape == (3, 5)
+    assert embeddings.tolist() == [
+        [1, 0, 0, 0, 0],
+        [0, 0, 0, 0, 1],
+        [0, 0, 1, 0, 0],
+    ]
+
+    assert embed_nodes_array([], MockEmbedding()).shape == (0, 0)
+
+
+def test_embed_nodes() -> None:
+    """Test the embedding map matches the embeddings array."""
+    nodes = [
+        TextNode(text="Hello world."),
+        TextNode(text="This is a test.", embedding=[0, 0, 0, 0, 1]),
+    ]
+    assert embed_nodes(nodes, MockEmbedding()) == {
+        nodes[0].node_id: [1, 0, 0, 0, 0],
+        nodes[1].node_id: [0, 0, 0, 0, 1],
+    }
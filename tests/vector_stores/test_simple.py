@@ -1,6 +1,8 @@
 import unittest
 from typing import List
 
+import numpy as np
+import pytest
 from llama_index.schema import NodeRelationship, RelatedNodeInfo, TextNode
 from llama_index.vector_stores import SimpleVectorStore
 from llama_index.vector_stores.types import (
@@ -148,3 +150,20 @@ class SimpleVectorStoreTest(unittest.TestCase):
             result.ids,
             [_NODE_ID_WEIGHT_3_RANK_C, _NODE_ID_WEIGHT_1_RANK_A],
         )
+
+    def test_add_embeddings_bulk_matches_add(self) -> None:
+        nodes = _node_embeddings_for_test()
+        simple_vector_store = SimpleVectorStore()
+        simple_vector_store.add(nodes)
+
+        bulk_vector_store = SimpleVectorStore()
+        embeddings = np.array([node.get_embedding() for node in nodes])
+        for node in nodes:
+            node.embedding = None
+        ids = bulk_vector_store.add_embeddings_bulk(nodes, embeddings)
+
+        self.assertEqual(ids, [node.node_id for node in nodes])
+        self.assertEqual(bulk_vector_store._data, simple_vector_store._data)
+
+        with pytest.raises(ValueError):
+            bulk_vector_store.add_embeddings_bulk(nodes, embeddings[:1])